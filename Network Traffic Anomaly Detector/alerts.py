@@ -280,14 +280,20 @@ class AlertManager:
                 "anomalies": json.loads(anomalies.to_json(orient='records'))
             }
 
-            # Nombre de archivo basado en timestamp
-            filename = os.path.join(
-                self.alerts_dir,
-                f"alert_{timestamp.strftime('%Y%m%d_%H%M%S')}.json"
-            )
-
-            # Guardar a archivo
-            with open(filename, 'w') as f:
+            # Nombre de archivo basado en timestamp (con microsegundos: varias alertas por segundo)
+            base_name = f"alert_{timestamp.strftime('%Y%m%d_%H%M%S_%f')}"
+            filename = os.path.join(self.alerts_dir, f"{base_name}.json")
+
+            # Guardar a archivo con creación exclusiva para no sobrescribir nunca una alerta existente
+            suffix = 0
+            while True:
+                try:
+                    f = open(filename, 'x')
+                    break
+                except FileExistsError:
+                    suffix += 1
+                    filename = os.path.join(self.alerts_dir, f"{base_name}_{suffix}.json")
+            with f:
                 json.dump(alert_data, f, indent=2)
 
             logger.info(f"Alert saved to file: {filename}")
@@ -1,8 +1,23 @@
+import ipaddress
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import LabelEncoder
 import pandas as pd
 # Import the configuration variable
 from config import ISOLATION_FOREST_CONTAMINATION
+from profiling import stage
+
+def _ip_to_numeric(x):
+    """
+    Converts an IP address string to a number for the model.
+
+    IPv4 keeps the original digit concatenation; IPv6 addresses are folded into 63 bits
+    so the column stays within int64.
+    """
+    if not isinstance(x, str):
+        return x
+    if ':' in x:
+        return int(ipaddress.IPv6Address(x)) % (1 << 63)
+    return int(x.replace('.', ''))
 
 def detect_anomalies(data):
     """
@@ -19,18 +34,20 @@ def detect_anomalies(data):
 
     # Convert IP addresses to numeric form (Note: This is a basic conversion, consider alternatives for better representation)
     # Ensure columns exist before attempting to transform
-    if 'src_ip' in processed_data.columns:
-        processed_data['src_ip'] = processed_data['src_ip'].apply(lambda x: int(x.replace('.', '')) if isinstance(x, str) else x)
-    if 'dst_ip' in processed_data.columns:
-        processed_data['dst_ip'] = processed_data['dst_ip'].apply(lambda x: int(x.replace('.', '')) if isinstance(x, str) else x)
+    with stage('detect.ip_encoding'):
+        if 'src_ip' in processed_data.columns:
+            processed_data['src_ip'] = processed_data['src_ip'].apply(_ip_to_numeric)
+        if 'dst_ip' in processed_data.columns:
+            processed_data['dst_ip'] = processed_data['dst_ip'].apply(_ip_to_numeric)
 
     # Encode the 'protocol' column to numerical values
     # Ensure column exists and handle potential non-string types
     if 'protocol' in processed_data.columns:
         # Convert to string first to handle potential NaN or other types
-        processed_data['protocol'] = processed_data['protocol'].astype(str)
-        label_encoder = LabelEncoder()
-        processed_data['protocol'] = label_encoder.fit_transform(processed_data['protocol'])
+        with stage('detect.label_encoding'):
+            processed_data['protocol'] = processed_data['protocol'].astype(str)
+            label_encoder = LabelEncoder()
+            processed_data['protocol'] = label_encoder.fit_transform(processed_data['protocol'])
 
     # Select only numeric columns for the model
     # This is a safer approach than using all columns
@@ -48,10 +65,12 @@ def detect_anomalies(data):
     # normal data separately and use the trained model here for prediction only.
     try:
         model = IsolationForest(contamination=ISOLATION_FOREST_CONTAMINATION, random_state=42) # Added random_state for reproducibility
-        model.fit(numeric_data) # type: ignore # Ignore potential type errors here - data is expected to be numeric
+        with stage('detect.fit'):
+            model.fit(numeric_data) # type: ignore # Ignore potential type errors here - data is expected to be numeric
 
         # Predict anomalies
-        predictions = model.predict(numeric_data)
+        with stage('detect.predict'):
+            predictions = model.predict(numeric_data)
 
         # Filter the original data based on predictions
         # Need to align predictions back to the original index
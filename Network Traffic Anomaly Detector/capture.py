@@ -1,6 +1,50 @@
-from scapy.all import sniff
+import queue
+from scapy.all import sniff, AsyncSniffer, conf
 # Import the configuration variable for packet count
 from config import PACKET_COUNT
+from profiling import stage
+
+
+def _open_raw_socket(iface=None):
+    """
+    Opens a listening socket that hands over frames without dissecting them.
+
+    The socket normally dissects every frame with its link-layer class as it is received,
+    which mixes scapy's dissection cost with the time spent waiting for traffic. The class
+    is swapped for scapy's raw layer here and returned, so dissect_frames can run it later
+    as a separately timed step.
+
+    Returns:
+    tuple: (socket, link-layer class or None if the socket does not expose one)
+    """
+    sock = conf.L2listen(iface=iface)
+    link_layer = getattr(sock, 'LL', None)
+    if link_layer is not None:
+        sock.LL = conf.raw_layer
+    return sock, link_layer
+
+
+def dissect_frames(frames, link_layer):
+    """
+    Dissects frames captured by a socket from _open_raw_socket.
+
+    Parameters:
+    frames (list): Raw frames (or already dissected packets if link_layer is None).
+    link_layer (type): The scapy class of the capture's link layer (e.g. Ether).
+
+    Returns:
+    list: The dissected packets, with their capture timestamps.
+    """
+    with stage('capture.dissect'):
+        if link_layer is None:
+            return list(frames)
+        packets = []
+        for frame in frames:
+            packet = link_layer(frame.load)
+            packet.time = frame.time
+            packets.append(packet)
+        return packets
+
 
 def capture_packets(count=PACKET_COUNT, iface=None, timeout=10):
     """
@@ -17,7 +61,12 @@ def capture_packets(count=PACKET_COUNT, iface=None, timeout=10):
     print(f"[*] Starting packet capture (count={count}, timeout={timeout}s, interface={iface if iface else 'default'})...")
     try:
         # Use the configured count, interface, and timeout
-        packets = sniff(count=count, iface=iface, timeout=timeout)
+        sock, link_layer = _open_raw_socket(iface)
+        try:
+            frames = sniff(count=count, opened_socket=sock, timeout=timeout)
+        finally:
+            sock.close()
+        packets = dissect_frames(frames, link_layer)
         print(f"[*] Captured {len(packets)} packets.")
         return packets
     except PermissionError:
@@ -27,6 +76,108 @@ def capture_packets(count=PACKET_COUNT, iface=None, timeout=10):
         print(f"[!] An error occurred during packet capture: {e}")
         return []
 
+
+def _report_capture_error(error):
+    """Prints a capture error the same way capture_packets does."""
+    if isinstance(error, PermissionError):
+        print("[!] Permission denied. Please run the script with root/administrator privileges for packet capture.")
+    else:
+        print(f"[!] An error occurred during packet capture: {error}")
+
+
+class ContinuousCapture:
+    """
+    Captures packets continuously on a background thread (scapy AsyncSniffer) into a bounded queue.
+
+    Unlike capture_packets, nothing is missed while the caller is busy analyzing the previous
+    batch: the sniffer keeps running and drain() hands over everything captured since the last call.
+    Frames are queued undissected; drain() dissects them on the caller's thread.
+    """
+
+    def __init__(self, iface=None, max_queue=100000):
+        """
+        Parameters:
+        iface (str, optional): The network interface to sniff on. Defaults to None (scapy's default).
+        max_queue (int): Maximum number of packets buffered between two drains; extra packets are dropped.
+        """
+        self.iface = iface
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._sniffer = None
+        self._socket = None
+        self._link_layer = None
+        self._failed = False
+
+    def start(self):
+        """Starts the background sniffer."""
+        print(f"[*] Starting continuous packet capture (interface={self.iface if self.iface else 'default'})...")
+        self._failed = False
+        try:
+            self._socket, self._link_layer = _open_raw_socket(self.iface)
+        except Exception as e:
+            _report_capture_error(e)
+            self._failed = True
+            return
+        self._sniffer = AsyncSniffer(opened_socket=self._socket, prn=self._enqueue, store=False)
+        self._sniffer.start()
+
+    def _enqueue(self, frame):
+        """Sniffer callback: buffers a frame, counting it as dropped if the queue is full."""
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def drain(self):
+        """
+        Returns every packet captured since the previous call.
+
+        Returns:
+        list: The buffered packets, dissected and in capture order (empty if nothing was captured).
+        """
+        frames = []
+        while True:
+            try:
+                frames.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self.dropped:
+            print(f"[!] Capture queue full, dropped {self.dropped} packets.")
+            self.dropped = 0
+        return dissect_frames(frames, self._link_layer)
+
+    def failed(self):
+        """
+        Checks whether the background sniffer died (e.g. missing privileges or interface down).
+
+        Returns:
+        bool: True if the sniffer is no longer capturing, False while it is running.
+        """
+        if self._failed:
+            self._failed = False
+            return True
+        if self._sniffer is None or self._sniffer.thread is None or self._sniffer.thread.is_alive():
+            return False
+        error = self._sniffer.exception
+        if error is not None:
+            _report_capture_error(error)
+        else:
+            print("[!] Packet capture stopped unexpectedly.")
+        self.stop()
+        return True
+
+    def stop(self):
+        """Stops the background sniffer and closes its socket."""
+        if self._sniffer is not None and self._sniffer.running:
+            try:
+                self._sniffer.stop()
+            except Exception as e:
+                print(f"[!] An error occurred while stopping packet capture: {e}")
+        self._sniffer = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
 # Example of how it might be called (for testing purposes, not part of the main logic)
 # if __name__ == "__main__":
 #     # You might need to run this script with sudo/administrator privileges
@@ -32,3 +32,51 @@ ALERT_CONFIG = {
         'CRITICAL': ['security-team@example.com', 'sysadmin@example.com', 'ciso@example.com']
     }
 }
+
+# Enrichment of anomaly rows (protocol/service names, TCP flags, asset zones, host names)
+ENRICHMENT_CONFIG = {
+    # CIDR subnet -> asset/zone tag. The most specific matching subnet wins.
+    'asset_subnets': {
+        '10.0.0.0/8': 'internal',
+        '172.16.0.0/12': 'internal',
+        '192.168.0.0/16': 'internal',
+        '127.0.0.0/8': 'loopback',
+        '169.254.0.0/16': 'link-local',
+        '224.0.0.0/4': 'multicast',
+        'fc00::/7': 'internal',
+        'fe80::/10': 'link-local',
+        '::1/128': 'loopback',
+    },
+
+    # Local hosts-format file used for reverse-DNS-like names (no network lookups)
+    'hosts_file': '/etc/hosts',
+}
+
+# Sliding-window mode: capture continuously and score window-level traffic aggregates
+WINDOW_CONFIG = {
+    'enabled': False,        # When False, main.py analyzes a single PACKET_COUNT snapshot
+    'bucket_seconds': 10,    # Duration of each time bucket
+    'window_buckets': 6,     # Number of buckets per sliding window (window = 60s by default)
+    'ewma_alpha': 0.1,       # Smoothing factor of the baseline mean/variance
+    'z_threshold': 4.0,      # Window z-score above which a window is flagged
+    'warmup_windows': 10,    # Windows used to build the baseline before flagging
+    'max_queue_packets': 100000,  # Packets buffered by the background capture between two buckets
+    'max_capture_failures': 5,    # Consecutive capture failures before giving up
+    'max_backoff_seconds': 300,   # Upper bound of the exponential retry delay after a failure
+}
+
+# Profiling mode (also enabled at runtime with `python main.py --profile`)
+PROFILING_CONFIG = {
+    'enabled': False,          # Profile without passing --profile
+    'windows': 5,              # Capture windows to profile before writing the output to logs/
+    'sample_interval': 0.005,  # Seconds between stack samples of the pipeline
+}
+
+# Local query API over recent anomalies and window summaries (most useful in sliding-window mode)
+QUERY_API_CONFIG = {
+    'enabled': False,
+    'host': '127.0.0.1',    # Only listen on localhost
+    'port': 8765,
+    'max_records': 10000,   # Anomaly rows kept in memory; older ones are served from logs/alerts
+    'max_windows': 1440,    # Window summaries kept in memory
+}
@@ -0,0 +1,294 @@
+import bisect
+import ipaddress
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import ENRICHMENT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# IANA assigned internet protocol numbers (subset relevant to traffic monitoring)
+IANA_PROTOCOLS = {
+    0: 'HOPOPT', 1: 'ICMP', 2: 'IGMP', 4: 'IPv4', 6: 'TCP', 8: 'EGP', 9: 'IGP',
+    17: 'UDP', 27: 'RDP', 33: 'DCCP', 41: 'IPv6', 43: 'IPv6-Route', 44: 'IPv6-Frag',
+    46: 'RSVP', 47: 'GRE', 50: 'ESP', 51: 'AH', 58: 'IPv6-ICMP', 59: 'IPv6-NoNxt',
+    60: 'IPv6-Opts', 88: 'EIGRP', 89: 'OSPF', 94: 'IPIP', 103: 'PIM', 112: 'VRRP',
+    115: 'L2TP', 132: 'SCTP', 136: 'UDPLite', 137: 'MPLS-in-IP',
+}
+
+# Well-known service ports (TCP and UDP share the same table)
+WELL_KNOWN_SERVICES = {
+    20: 'ftp-data', 21: 'ftp', 22: 'ssh', 23: 'telnet', 25: 'smtp', 53: 'dns',
+    67: 'dhcp-server', 68: 'dhcp-client', 69: 'tftp', 80: 'http', 88: 'kerberos',
+    110: 'pop3', 111: 'rpcbind', 123: 'ntp', 135: 'msrpc', 137: 'netbios-ns',
+    138: 'netbios-dgm', 139: 'netbios-ssn', 143: 'imap', 161: 'snmp', 162: 'snmptrap',
+    179: 'bgp', 389: 'ldap', 443: 'https', 445: 'smb', 465: 'smtps', 500: 'isakmp',
+    514: 'syslog', 587: 'submission', 636: 'ldaps', 853: 'dns-over-tls', 873: 'rsync',
+    993: 'imaps', 995: 'pop3s', 1194: 'openvpn', 1433: 'mssql', 1521: 'oracle',
+    1723: 'pptp', 1883: 'mqtt', 2049: 'nfs', 2375: 'docker', 2376: 'docker-tls',
+    3306: 'mysql', 3389: 'rdp', 4789: 'vxlan', 5060: 'sip', 5353: 'mdns', 5432: 'postgresql',
+    5900: 'vnc', 6379: 'redis', 6443: 'kubernetes-api', 8080: 'http-alt', 8443: 'https-alt',
+    9200: 'elasticsearch', 11211: 'memcached', 27017: 'mongodb',
+}
+
+# TCP flag bits in header order (FIN is bit 0)
+TCP_FLAG_BITS = ['FIN', 'SYN', 'RST', 'PSH', 'ACK', 'URG', 'ECE', 'CWR', 'NS']
+
+
+def _build_protocol_table() -> np.ndarray:
+    """Builds a 256-entry array mapping IP protocol numbers to IANA names."""
+    table = np.array([f'Unknown({i})' for i in range(256)], dtype=object)
+    for number, name in IANA_PROTOCOLS.items():
+        table[number] = name
+    return table
+
+
+def _build_service_table() -> np.ndarray:
+    """Builds a 65536-entry array mapping ports to service names (None if unknown)."""
+    table = np.full(65536, None, dtype=object)
+    for port, name in WELL_KNOWN_SERVICES.items():
+        table[port] = name
+    return table
+
+
+def _build_tcp_flags_table() -> np.ndarray:
+    """Builds a 512-entry array with the decoded flag string for every 9-bit flag value."""
+    table = np.empty(1 << len(TCP_FLAG_BITS), dtype=object)
+    for value in range(len(table)):
+        table[value] = '|'.join(name for bit, name in enumerate(TCP_FLAG_BITS) if value & (1 << bit))
+    return table
+
+
+PROTOCOL_TABLE = _build_protocol_table()
+SERVICE_TABLE = _build_service_table()
+TCP_FLAGS_TABLE = _build_tcp_flags_table()
+
+
+class SubnetIndex:
+    """
+    Interval index over a list of CIDR subnets used to tag addresses with an asset/zone.
+
+    Overlapping subnets are flattened into disjoint ranges at build time, with the most
+    specific subnet winning, so a lookup is a single binary search over range starts.
+    IPv4 lookups are vectorized with numpy; IPv6 ranges use a separate bisect index.
+    """
+
+    def __init__(self, subnets: Dict[str, str]):
+        """
+        Parameters:
+        subnets (dict): Mapping of CIDR string to zone/asset tag, e.g. {'10.0.0.0/8': 'internal'}.
+        """
+        networks = {4: [], 6: []}
+        for cidr, tag in subnets.items():
+            try:
+                network = ipaddress.ip_network(cidr, strict=False)
+            except ValueError:
+                logger.warning(f"Ignoring invalid subnet in enrichment config: {cidr}")
+                continue
+            networks[network.version].append((network, tag))
+
+        v4_starts, v4_tags = self._flatten(networks[4])
+        self._v4_starts = np.array(v4_starts, dtype=np.uint64)
+        self._v4_tags = np.array(v4_tags + [None], dtype=object)  # Last slot is the "no match" tag
+        self._v6_starts, self._v6_tags = self._flatten(networks[6])
+
+    @staticmethod
+    def _flatten(networks: List[Tuple[ipaddress._BaseNetwork, str]]) -> Tuple[List[int], List[Optional[str]]]:
+        """
+        Flattens (possibly nested) networks into sorted, disjoint ranges.
+
+        Returns:
+        tuple: (range_starts, range_tags) where range_tags[i] applies to [starts[i], starts[i+1]).
+        """
+        if not networks:
+            return [], []
+
+        breakpoints = set()
+        for network, _ in networks:
+            breakpoints.add(int(network.network_address))
+            breakpoints.add(int(network.broadcast_address) + 1)
+        starts = sorted(breakpoints)
+        tags: List[Optional[str]] = [None] * len(starts)
+
+        # Paint from least to most specific so the longest prefix wins
+        for network, tag in sorted(networks, key=lambda item: item[0].prefixlen):
+            first = bisect.bisect_left(starts, int(network.network_address))
+            last = bisect.bisect_left(starts, int(network.broadcast_address) + 1)
+            for i in range(first, last):
+                tags[i] = tag
+
+        return starts, tags
+
+    def lookup_v4(self, addresses: np.ndarray) -> np.ndarray:
+        """
+        Vectorized zone lookup for IPv4 addresses given as integers.
+
+        Parameters:
+        addresses (numpy.ndarray): Integer IPv4 addresses; negative values mark missing addresses.
+
+        Returns:
+        numpy.ndarray: Object array of tags (None where no subnet matches).
+        """
+        no_match = len(self._v4_tags) - 1
+        if len(self._v4_starts) == 0:
+            return np.full(len(addresses), None, dtype=object)
+        valid = addresses >= 0
+        positions = np.searchsorted(self._v4_starts, addresses.clip(min=0).astype(np.uint64), side='right') - 1
+        positions = np.where(valid & (positions >= 0), positions, no_match)
+        return self._v4_tags[positions]
+
+    def lookup(self, address: str) -> Optional[str]:
+        """Zone lookup for a single IPv4 or IPv6 address string."""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        if ip.version == 4:
+            return self.lookup_v4(np.array([int(ip)], dtype=np.int64))[0]
+        position = bisect.bisect_right(self._v6_starts, int(ip)) - 1
+        return self._v6_tags[position] if position >= 0 else None
+
+
+class HostsFileResolver:
+    """
+    Reverse-DNS-like resolver backed by a local hosts-format file ("<ip> <name> [aliases]").
+
+    No network lookups are performed. The file is loaded once into a dict keyed by the
+    canonical address form, which is already the complete answer set: its size is bounded
+    by the file itself, so a separate (LRU) cache would only duplicate entries.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Parameters:
+        path (str, optional): Path to the hosts-format file. If missing, every lookup returns None.
+        """
+        self._names: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            self._load(path)
+        elif path:
+            logger.warning(f"Hosts file for enrichment not found: {path}")
+
+    def _load(self, path: str):
+        """Loads the first hostname for every address in the file (first entry wins)."""
+        with open(path) as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) < 2:
+                    continue
+                try:
+                    address = str(ipaddress.ip_address(fields[0]))
+                except ValueError:
+                    continue
+                self._names.setdefault(address, fields[1])
+        logger.info(f"Loaded {len(self._names)} host names from {path}")
+
+    def resolve(self, address: str) -> Optional[str]:
+        """Returns the host name for a single address (in any textual form), or None if unknown."""
+        try:
+            # Normalize so that e.g. differently compressed IPv6 forms hit the same entry
+            address = str(ipaddress.ip_address(address))
+        except ValueError:
+            return None
+        return self._names.get(address)
+
+    def resolve_many(self, addresses: pd.Series) -> pd.Series:
+        """
+        Resolves a whole column of addresses with one vectorized map.
+
+        Addresses decoded by scapy are already in canonical form (dotted IPv4, compressed
+        IPv6), so they match the normalized keys without per-address parsing.
+
+        Returns:
+        pandas.Series: Host names aligned with `addresses` (NaN where unknown).
+        """
+        if not self._names:
+            return pd.Series(None, index=addresses.index, dtype=object)
+        return addresses.map(self._names)
+
+
+def _ipv4_to_int(addresses: pd.Series) -> np.ndarray:
+    """Converts a Series of IPv4 strings to integers (-1 for missing or non-IPv4 values)."""
+    octets = addresses.astype('string').str.extract(r'^(\d+)\.(\d+)\.(\d+)\.(\d+)$')
+    octets = octets.apply(pd.to_numeric, errors='coerce')
+    values = (octets[0] * (1 << 24) + octets[1] * (1 << 16) + octets[2] * (1 << 8) + octets[3])
+    return values.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _int_column(data: pd.DataFrame, column: str, upper: int) -> np.ndarray:
+    """Returns a column as int64 with -1 where the value is missing or out of [0, upper)."""
+    if column not in data.columns:
+        return np.full(len(data), -1, dtype=np.int64)
+    values = pd.to_numeric(data[column], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return np.where((values >= 0) & (values < upper), values, -1)
+
+
+class Enricher:
+    """Applies the precomputed enrichment tables to whole batches of preprocessed rows."""
+
+    def __init__(self, config: Optional[dict] = None):
+        """
+        Parameters:
+        config (dict, optional): Enrichment settings. Defaults to ENRICHMENT_CONFIG from config.
+        """
+        self.config = config if config else ENRICHMENT_CONFIG
+        self.subnets = SubnetIndex(self.config.get('asset_subnets', {}))
+        self.resolver = HostsFileResolver(self.config.get('hosts_file'))
+
+    def enrich(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds human-readable enrichment columns to a DataFrame produced by preprocess_packets.
+
+        Added columns: protocol_name, service, tcp_flags_str, src_zone, dst_zone,
+        src_host and dst_host.
+
+        Parameters:
+        data (pandas.DataFrame): Preprocessed (or anomaly) rows.
+
+        Returns:
+        pandas.DataFrame: A copy of the input with the enrichment columns appended.
+        """
+        enriched = data.copy()
+        if enriched.empty:
+            for column in ('protocol_name', 'service', 'tcp_flags_str',
+                           'src_zone', 'dst_zone', 'src_host', 'dst_host'):
+                enriched[column] = pd.Series(dtype=object)
+            return enriched
+
+        # Array lookups: a missing value (-1) selects the "unknown" slot appended to each table
+        protocol_num = _int_column(enriched, 'protocol_num', len(PROTOCOL_TABLE))
+        enriched['protocol_name'] = np.append(PROTOCOL_TABLE, None)[protocol_num]
+
+        dst_port = _int_column(enriched, 'dst_port', len(SERVICE_TABLE))
+        src_port = _int_column(enriched, 'src_port', len(SERVICE_TABLE))
+        services = np.append(SERVICE_TABLE, None)
+        dst_service = services[dst_port]
+        # Fall back to the source port so replies from well-known services are labelled too
+        enriched['service'] = np.where(pd.isna(dst_service), services[src_port], dst_service)
+
+        tcp_flags = _int_column(enriched, 'tcp_flags', len(TCP_FLAGS_TABLE))
+        enriched['tcp_flags_str'] = np.append(TCP_FLAGS_TABLE, None)[tcp_flags]
+
+        for side in ('src', 'dst'):
+            column = f'{side}_ip'
+            if column not in enriched.columns:
+                enriched[f'{side}_zone'] = None
+                enriched[f'{side}_host'] = None
+                continue
+            addresses = enriched[column]
+            ipv4 = _ipv4_to_int(addresses)
+            zones = self.subnets.lookup_v4(ipv4)
+            # Only addresses that are not IPv4 (i.e. IPv6) go through the scalar lookup, once per unique value
+            others = addresses.notna().to_numpy() & (ipv4 < 0)
+            if others.any():
+                unique_zones = {a: self.subnets.lookup(a) for a in addresses[others].unique()}
+                zones = np.where(others, addresses.map(unique_zones), zones)
+            enriched[f'{side}_zone'] = zones
+
+            enriched[f'{side}_host'] = self.resolver.resolve_many(addresses)
+
+        return enriched
@@ -1,12 +1,18 @@
-from capture import capture_packets
+from capture import capture_packets, ContinuousCapture
 # Import the new function that processes a list of packets and returns a DataFrame
 from preprocess import preprocess_packets
 from anomaly_detection import detect_anomalies
 from alerts import AlertManager, logger as alerts_logger
+from enrichment import Enricher
+from windowing import SlidingWindowScorer
+from profiling import stage, end_window, start_profiling, stop_profiling
+from query_api import AnomalyIndex, start_query_api
 import pandas as pd
+import argparse
 import logging
 import os
-from config import PACKET_COUNT, ALERT_CONFIG
+import time
+from config import PACKET_COUNT, ALERT_CONFIG, WINDOW_CONFIG, PROFILING_CONFIG, QUERY_API_CONFIG
 import sys # Import sys for geteuid check
 
 # Crear directorio para logs si no existe
@@ -66,27 +72,41 @@ def determine_severity(anomalies: pd.DataFrame) -> str:
     else:
         return 'CRITICAL'
 
-def main():
-    logger.info("Starting network anomaly detection process.")
+def determine_window_severity(windows: pd.DataFrame, z_threshold: float) -> str:
+    """
+    Determina el nivel de severidad de las ventanas anómalas según su puntuación
 
-    # Inicializar el gestor de alertas
-    alert_manager = AlertManager(ALERT_CONFIG)
-    logger.info("Alert manager initialized.")
+    Args:
+        windows (DataFrame): Ventanas marcadas como anómalas por SlidingWindowScorer
+        z_threshold (float): Umbral de puntuación configurado
 
-    # Capturar paquetes
-    logger.info(f"Starting packet capture (count={PACKET_COUNT})...")
-    # capture_packets now uses the PACKET_COUNT from config internally
-    # Convert the PacketList returned by capture_packets to a standard list
-    packets = list(capture_packets())
-    logger.info(f"Captured {len(packets)} packets.")
+    Returns:
+        str: Nivel de severidad (LOW, MEDIUM, HIGH, CRITICAL)
+    """
+    if windows.empty:
+        return 'LOW'
 
-    # Verificar si se capturaron paquetes
-    if not packets:
-        logger.warning("No packets captured. Stopping analysis.")
-        # Optionally send a low severity alert or log this condition
-        # alert_manager.send_alert(pd.DataFrame(), 'LOW', "No packets captured.")
-        return
+    # Cuántas veces supera la peor ventana el umbral configurado
+    ratio = windows['score'].max() / z_threshold
+    if ratio <= 1.5:
+        return 'MEDIUM'
+    elif ratio <= 3:
+        return 'HIGH'
+    else:
+        return 'CRITICAL'
 
+def analyze_packets(packets, alert_manager: AlertManager, enricher: Enricher, scorer: SlidingWindowScorer = None,
+                    index: AnomalyIndex = None):
+    """
+    Ejecuta preprocesamiento, detección y alertas sobre un lote de paquetes
+
+    Args:
+        packets (list): Paquetes capturados
+        alert_manager (AlertManager): Gestor de alertas
+        enricher (Enricher): Tablas de enriquecimiento para las anomalías
+        scorer (SlidingWindowScorer, optional): Si se indica, también se puntúan las ventanas deslizantes
+        index (AnomalyIndex, optional): Si se indica, las anomalías y ventanas se indexan para la API de consultas
+    """
     # Preprocesar datos
     logger.info("Starting data preprocessing...")
     # Pass the standard list of packets to the preprocessing function
@@ -100,6 +120,19 @@ def main():
         # alert_manager.send_alert(pd.DataFrame(), 'LOW', "No valid data after preprocessing.")
         return
 
+    # Puntuar las ventanas deslizantes que se cierran con este lote
+    if scorer is not None:
+        with stage('window_scoring'):
+            windows = scorer.update(processed_df)
+        flagged = windows[windows['anomaly'].astype(bool)]
+        logger.info(f"Scored {len(windows)} sliding windows, {len(flagged)} flagged as anomalous.")
+        if index is not None:
+            index.add_windows(windows)
+        if not flagged.empty:
+            window_severity = determine_window_severity(flagged, scorer.z_threshold)
+            with stage('alerting'):
+                alert_manager.send_alert(flagged, window_severity)
+
     # Detectar anomalías
     logger.info("Starting anomaly detection...")
     # Pass the processed DataFrame to the anomaly detection function
@@ -111,12 +144,94 @@ def main():
 
     if not anomalies.empty:
         logger.info(f"Anomalies detected. Severity determined as: {severity}")
-        alert_manager.send_alert(anomalies, severity)
+        with stage('enrichment'):
+            anomalies = enricher.enrich(anomalies)
+        with stage('alerting'):
+            alert_manager.send_alert(anomalies, severity)
+        if index is not None:
+            index.add_anomalies(anomalies, severity)
     else:
         logger.info("No anomalies detected. No alert sent.")
 
+def main():
+    logger.info("Starting network anomaly detection process.")
+
+    # Inicializar el gestor de alertas
+    alert_manager = AlertManager(ALERT_CONFIG)
+    logger.info("Alert manager initialized.")
+
+    # Inicializar las tablas de enriquecimiento (se construyen una sola vez)
+    enricher = Enricher()
+
+    # API de consultas local sobre las anomalías recientes (solo tiene sentido si el proceso sigue vivo)
+    index = None
+    if QUERY_API_CONFIG['enabled'] and not WINDOW_CONFIG['enabled']:
+        logger.warning("Query API is enabled but sliding-window mode is not; the process exits after one "
+                       "snapshot, so the API is not started. Enable WINDOW_CONFIG['enabled'] to use it.")
+    elif QUERY_API_CONFIG['enabled']:
+        index = AnomalyIndex(QUERY_API_CONFIG['max_records'], QUERY_API_CONFIG['max_windows'])
+        start_query_api(index, QUERY_API_CONFIG, alert_manager.alerts_dir)
+
+    # Modo de ventana deslizante: capturar sin interrupciones en segundo plano y puntuar
+    # cada bucket con todo lo capturado, también mientras se analizaba el lote anterior
+    if WINDOW_CONFIG['enabled']:
+        scorer = SlidingWindowScorer(WINDOW_CONFIG)
+        logger.info(f"Sliding-window mode enabled ({scorer.window_buckets} x {scorer.bucket_seconds}s buckets).")
+        capture = ContinuousCapture(max_queue=WINDOW_CONFIG['max_queue_packets'])
+        capture.start()
+        failures = 0
+        try:
+            while True:
+                time.sleep(scorer.bucket_seconds)
+                if capture.failed():
+                    # Reintentar con espera exponencial en lugar de seguir registrando capturas vacías
+                    failures += 1
+                    if failures >= WINDOW_CONFIG['max_capture_failures']:
+                        logger.error(f"Packet capture failed {failures} times in a row. Stopping.")
+                        return
+                    delay = min(scorer.bucket_seconds * 2 ** failures, WINDOW_CONFIG['max_backoff_seconds'])
+                    logger.warning(f"Packet capture failed ({failures}/{WINDOW_CONFIG['max_capture_failures']}). "
+                                   f"Retrying in {delay:.0f}s.")
+                    time.sleep(delay)
+                    capture.start()
+                    continue
+                failures = 0
+                with stage('capture'):
+                    packets = capture.drain()
+                logger.info(f"Captured {len(packets)} packets.")
+                if packets:
+                    analyze_packets(packets, alert_manager, enricher, scorer, index)
+                end_window()
+        finally:
+            capture.stop()
+
+    # Capturar paquetes
+    logger.info(f"Starting packet capture (count={PACKET_COUNT})...")
+    # capture_packets now uses the PACKET_COUNT from config internally
+    # Convert the PacketList returned by capture_packets to a standard list
+    with stage('capture'):
+        packets = list(capture_packets())
+    logger.info(f"Captured {len(packets)} packets.")
+
+    # Verificar si se capturaron paquetes
+    if not packets:
+        logger.warning("No packets captured. Stopping analysis.")
+        # Optionally send a low severity alert or log this condition
+        # alert_manager.send_alert(pd.DataFrame(), 'LOW', "No packets captured.")
+        return
+
+    analyze_packets(packets, alert_manager, enricher, index=index)
+    end_window()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Network Traffic Anomaly Detector")
+    parser.add_argument('--profile', action='store_true', default=PROFILING_CONFIG['enabled'],
+                        help="Profile each pipeline stage and write flamegraph data to logs/")
+    parser.add_argument('--profile-windows', type=int, default=PROFILING_CONFIG['windows'],
+                        help="Number of capture windows to profile")
+    args = parser.parse_args()
+
     # Ensure running with sufficient privileges for packet capture
     # Note: os.geteuid() is Unix-specific. For Windows, you'd need a different check.
     if os.name == 'posix' and os.geteuid() != 0:
@@ -129,9 +244,15 @@ if __name__ == "__main__":
          logger.warning("Running on Windows. Packet capture might require administrator privileges.")
 
 
+    if args.profile:
+        start_profiling(args.profile_windows, PROFILING_CONFIG['sample_interval'], 'logs')
+
     try:
         main()
     except KeyboardInterrupt:
         logger.info("Process interrupted by user (KeyboardInterrupt).")
     except Exception as e:
         logger.error(f"An unexpected error occurred during main execution: {e}", exc_info=True)
+    finally:
+        # Write whatever was profiled if the run ended before reaching the window count
+        stop_profiling()
@@ -1,93 +1,198 @@
 # type: ignore # Ignore type checking for the entire file due to Scapy/Pandas type issues
-from scapy.all import IP, TCP, UDP, ICMP, Packet
+from scapy.all import Ether, Dot1Q, IP, IPv6, TCP, UDP, ICMP, GRE, Packet
+from scapy.layers.inet6 import IPv6ExtHdrHopByHop, IPv6ExtHdrRouting, IPv6ExtHdrFragment, IPv6ExtHdrDestOpt
+from scapy.layers.vxlan import VXLAN
 import pandas as pd
 from typing import List, Dict, Any
+from profiling import stage
+
+# Fixed feature schema: every DataFrame returned by preprocess_packets has exactly these
+# columns, in this order and with these dtypes, whatever mix of traffic was captured.
+FEATURE_SCHEMA = {
+    'timestamp': 'float64',
+    'vlan_id': 'Int64',         # Outermost 802.1Q/802.1ad VLAN ID of the captured frame
+    'inner_vlan_id': 'Int64',   # VLAN ID of the Ethernet frame carried by a VXLAN/GRE tunnel
+    'ip_version': 'Int64',      # 4 or 6 (of the innermost decoded IP header)
+    'src_ip': 'object',         # Innermost addresses (the tunneled traffic, if any)
+    'dst_ip': 'object',
+    'outer_src_ip': 'object',   # Tunnel endpoint addresses (only set for encapsulated traffic)
+    'outer_dst_ip': 'object',
+    'tunnel': 'object',         # Outermost encapsulation: GRE, VXLAN or IPIP
+    'length': 'Int64',
+    'protocol_num': 'Int64',    # IPv4 protocol / IPv6 next header after extension headers
+    'protocol': 'object',
+    'src_port': 'Int64',
+    'dst_port': 'Int64',
+    'tcp_flags': 'Int64',       # Raw TCP flag bits (FIN=0x01, SYN=0x02, RST=0x04, ...)
+    'icmp_type': 'Int64',
+    'icmp_code': 'Int64',
+}
+
+# Fields filled by the transport decoding, reset before decoding a tunneled packet
+_TRANSPORT_DEFAULTS = {
+    'protocol_num': None, 'protocol': None, 'src_port': None, 'dst_port': None,
+    'tcp_flags': None, 'icmp_type': None, 'icmp_code': None,
+}
+
+_EMPTY_FEATURES = dict.fromkeys(FEATURE_SCHEMA)
+
+_IPV6_EXT_HEADERS = (IPv6ExtHdrHopByHop, IPv6ExtHdrRouting, IPv6ExtHdrFragment, IPv6ExtHdrDestOpt)
+
+_ICMPV6_PROTO = 58
+
+# Maximum number of nested encapsulations decoded per packet
+_MAX_TUNNEL_DEPTH = 2
+
+
+def _skip_link_layers(layer: Packet, features: Dict[str, Any], vlan_key: str = 'vlan_id') -> Packet:
+    """
+    Skips the Ethernet header and any VLAN tags, recording the outermost VLAN ID.
+
+    Parameters:
+    layer (scapy.packet.Packet): The link layer to skip.
+    features (dict): Feature dictionary to fill in place.
+    vlan_key (str): Feature receiving the VLAN ID ('inner_vlan_id' for frames inside a tunnel).
+
+    Returns:
+    scapy.packet.Packet: The first layer after the link-layer headers.
+    """
+    if isinstance(layer, Ether):
+        layer = layer.payload
+    while isinstance(layer, Dot1Q): # Dot1AD (QinQ) is a subclass of Dot1Q
+        if features[vlan_key] is None:
+            features[vlan_key] = layer.vlan
+        layer = layer.payload
+    return layer
+
+
+def _decode_ip(layer: Packet, features: Dict[str, Any], depth: int = 0) -> bool:
+    """
+    Extracts address and transport features from an IPv4 or IPv6 layer, following tunnels.
+
+    Parameters:
+    layer (scapy.packet.Packet): The network layer to decode.
+    features (dict): Feature dictionary to fill in place.
+    depth (int): Current encapsulation depth.
+
+    Returns:
+    bool: False if the layer is not IPv4/IPv6, True otherwise.
+    """
+    if isinstance(layer, IP):
+        features['ip_version'] = 4
+        proto = layer.proto
+        transport = layer.payload
+    elif isinstance(layer, IPv6):
+        features['ip_version'] = 6
+        proto = layer.nh
+        transport = layer.payload
+        # Walk the extension header chain to reach the upper-layer protocol
+        while isinstance(transport, _IPV6_EXT_HEADERS):
+            proto = transport.nh
+            transport = transport.payload
+    else:
+        return False
+
+    features['src_ip'] = layer.src
+    features['dst_ip'] = layer.dst
+    features['protocol_num'] = proto # Store protocol number
+
+    tunnel = None
+    if isinstance(transport, TCP):
+        features['protocol'] = 'TCP'
+        features['src_port'] = transport.sport
+        features['dst_port'] = transport.dport
+        # Add TCP flags (optional but useful)
+        features['tcp_flags'] = int(transport.flags)
+    elif isinstance(transport, UDP):
+        features['protocol'] = 'UDP'
+        features['src_port'] = transport.sport
+        features['dst_port'] = transport.dport
+        if isinstance(transport.payload, VXLAN):
+            tunnel = ('VXLAN', transport.payload.payload)
+    elif isinstance(transport, ICMP):
+        features['protocol'] = 'ICMP'
+        features['icmp_type'] = transport.type
+        features['icmp_code'] = transport.code
+    elif proto == _ICMPV6_PROTO:
+        features['protocol'] = 'ICMPv6'
+        features['icmp_type'] = getattr(transport, 'type', None)
+        features['icmp_code'] = getattr(transport, 'code', None)
+    elif isinstance(transport, GRE):
+        features['protocol'] = 'GRE'
+        tunnel = ('GRE', transport.payload)
+    elif isinstance(transport, (IP, IPv6)):
+        features['protocol'] = 'IPIP'
+        tunnel = ('IPIP', transport)
+    else:
+        # Handle other IP protocols or packets without a common transport layer
+        features['protocol'] = f'Other_IP({proto})'
+
+    if tunnel is not None and depth < _MAX_TUNNEL_DEPTH:
+        name, inner = tunnel
+        inner = _skip_link_layers(inner, features, 'inner_vlan_id') # VXLAN and GRE (TEB) carry Ethernet frames
+        if isinstance(inner, (IP, IPv6)):
+            if features['tunnel'] is None:
+                features['tunnel'] = name
+                features['outer_src_ip'] = features['src_ip']
+                features['outer_dst_ip'] = features['dst_ip']
+            features.update(_TRANSPORT_DEFAULTS)
+            _decode_ip(inner, features, depth + 1)
+
+    return True
+
 
 def preprocess_packets(packets: List[Packet]) -> pd.DataFrame:
     """
     Preprocesses a list of network packets to extract relevant features and returns a DataFrame.
 
+    IPv4 and IPv6 (including extension headers) are decoded, as well as 802.1Q VLAN tags and
+    GRE, VXLAN and IP-in-IP tunnels. For tunneled traffic, src_ip/dst_ip and the transport
+    fields describe the inner packet and outer_src_ip/outer_dst_ip the tunnel endpoints.
+
     Parameters:
     packets (List[scapy.packet.Packet]): A list of captured network packets.
 
     Returns:
-    pandas.DataFrame: A DataFrame containing the extracted features for packets that could be processed.
-                      Returns an empty DataFrame if the input list is empty or no packets could be processed.
+    pandas.DataFrame: A DataFrame with the columns and dtypes of FEATURE_SCHEMA for packets that could be processed.
+                      Returns an empty DataFrame with the same schema if the input list is empty or no packets could be processed.
     """
     processed_data_list: List[Dict[str, Any]] = []
 
     print(f"[*] Preprocessing {len(packets)} packets...")
 
-    for packet in packets:
-        features: Dict[str, Any] = {}
-
-        # Add timestamp (useful for time-based analysis later)
-        features['timestamp'] = packet.time
-
-        # Check for IP layer
-        if IP in packet:
-            features['src_ip'] = packet[IP].src
-            features['dst_ip'] = packet[IP].dst
-            features['length'] = len(packet)
-            features['protocol_num'] = packet[IP].proto # Store protocol number
-
-            # Check for Transport Layer (TCP, UDP, ICMP)
-            if TCP in packet:
-                features['protocol'] = 'TCP'
-                features['src_port'] = packet[TCP].sport
-                features['dst_port'] = packet[TCP].dport
-                # Add TCP flags (optional but useful)
-                features['tcp_flags'] = packet[TCP].flags
-            elif UDP in packet:
-                features['protocol'] = 'UDP'
-                features['src_port'] = packet[UDP].sport
-                features['dst_port'] = packet[UDP].dport
-                features['tcp_flags'] = None # No TCP flags for UDP
-            elif ICMP in packet:
-                features['protocol'] = 'ICMP'
-                features['icmp_type'] = packet[ICMP].type
-                features['icmp_code'] = packet[ICMP].code
-                features['src_port'] = None # No ports for ICMP
-                features['dst_port'] = None
-                features['tcp_flags'] = None
-            else:
-                # Handle other IP protocols or packets without a common transport layer
-                features['protocol'] = f'Other_IP({packet[IP].proto})'
-                features['src_port'] = None
-                features['dst_port'] = None
-                features['tcp_flags'] = None
-        else:
-            # Handle non-IP packets (e.g., ARP)
-            features['src_ip'] = None
-            features['dst_ip'] = None
-            features['length'] = len(packet)
-            features['protocol_num'] = None
-            features['protocol'] = packet.summary().split()[0] if packet.summary() else 'Non-IP' # Basic attempt to get protocol name
-            features['src_port'] = None
-            features['dst_port'] = None
-            features['tcp_flags'] = None
-
-
-        # Add the extracted features to our list
-        processed_data_list.append(features)
+    with stage('preprocess.decode'):
+        for packet in packets:
+            features: Dict[str, Any] = _EMPTY_FEATURES.copy()
+
+            # Add timestamp (useful for time-based analysis later)
+            features['timestamp'] = packet.time
+            # Captured bytes; avoids rebuilding the packet when it was dissected from the wire
+            features['length'] = len(packet.original) if packet.original else len(packet)
+
+            # Walk the layers directly: plain Ether/IP traffic only costs a few isinstance checks
+            network = _skip_link_layers(packet, features)
+            if not _decode_ip(network, features):
+                # Other link types (e.g. Linux cooked capture) still carry an IP layer somewhere
+                ip_layer = packet.getlayer(IP)
+                if ip_layer is None:
+                    ip_layer = packet.getlayer(IPv6)
+                if ip_layer is None or not _decode_ip(ip_layer, features):
+                    # Handle non-IP packets (e.g., ARP)
+                    summary = packet.summary() # Build the summary only once, it is expensive
+                    features['protocol'] = summary.split()[0] if summary else 'Non-IP' # Basic attempt to get protocol name
+
+            # Add the extracted features to our list
+            processed_data_list.append(features)
 
     # Convert the list of dictionaries into a pandas DataFrame
     if not processed_data_list:
         print("[*] No packets could be processed into features.")
         # Return an empty DataFrame with expected columns even if no data
         # type: ignore # Ignore type checking here due to Pyright/Pandas stub issue
-        return pd.DataFrame(columns=['timestamp', 'src_ip', 'dst_ip', 'length', 'protocol_num',
-                                     'protocol', 'src_port', 'dst_port', 'tcp_flags'])
-
-
-    df = pd.DataFrame(processed_data_list)
-
-    # Optional: Basic data type conversion after creating DataFrame
-    # This can help ensure numeric types are correct, especially for ports and length
-    # df['length'] = pd.to_numeric(df['length'], errors='coerce')
-    # df['src_port'] = pd.to_numeric(df['src_port'], errors='coerce')
-    # df['dst_port'] = pd.to_numeric(df['dst_port'], errors='coerce')
+        return pd.DataFrame(columns=list(FEATURE_SCHEMA)).astype(FEATURE_SCHEMA)
 
+    with stage('preprocess.dataframe'):
+        df = pd.DataFrame(processed_data_list, columns=list(FEATURE_SCHEMA)).astype(FEATURE_SCHEMA)
 
     print(f"[*] Finished preprocessing. Created DataFrame with {len(df)} rows.")
     return df
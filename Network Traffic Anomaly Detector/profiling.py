@@ -0,0 +1,169 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Active profiler, None when profiling is disabled
+_profiler = None
+
+# Shared no-op context manager returned by stage() when profiling is disabled
+_NULL_STAGE = nullcontext()
+
+
+def stage(name: str):
+    """
+    Marks a pipeline stage. Use as `with stage('preprocess'): ...`.
+
+    When profiling is disabled this returns a shared no-op context manager, so
+    instrumented code pays nothing beyond the call itself.
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _profiler.stage(name)
+
+
+def end_window():
+    """Signals that one capture window went through the pipeline."""
+    if _profiler is not None:
+        _profiler.end_window()
+
+
+def start_profiling(windows: int = 5, sample_interval: float = 0.005, output_dir: str = 'logs'):
+    """
+    Enables profiling for the next `windows` capture windows.
+
+    Parameters:
+    windows (int): Number of windows to profile before writing the output and stopping.
+    sample_interval (float): Seconds between stack samples of the pipeline thread.
+    output_dir (str): Directory where the collapsed stacks and the summary are written.
+    """
+    global _profiler
+    if _profiler is not None:
+        logger.warning("Profiling is already running.")
+        return
+    _profiler = PipelineProfiler(windows, sample_interval, output_dir)
+    _profiler.start()
+
+
+def stop_profiling():
+    """Stops profiling (if running) and writes whatever was collected."""
+    if _profiler is not None:
+        _profiler.finish()
+
+
+class PipelineProfiler:
+    """
+    Per-stage timer plus a low-overhead sampling profiler for the pipeline thread.
+
+    A background thread samples the stack of the thread that started profiling every
+    `sample_interval` seconds while a stage is active. Samples are prefixed with the
+    active stage names and written in collapsed-stack format ("a;b;c count"), ready
+    for flamegraph.pl, speedscope or inferno. Stage wall times are summarized in a table.
+    """
+
+    def __init__(self, windows: int, sample_interval: float, output_dir: str):
+        self.windows = windows
+        self.sample_interval = sample_interval
+        self.output_dir = output_dir
+
+        self._stages = []  # Stack of active stage names
+        self._timings = defaultdict(lambda: [0, 0.0, 0.0])  # name -> [calls, total, max]
+        self._samples = Counter()
+        self._stage_samples = Counter()
+        self._windows_done = 0
+
+        self._target_thread = None
+        self._stop_event = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def start(self):
+        """Starts the sampler thread for the calling thread."""
+        self._target_thread = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name='pipeline-profiler', daemon=True)
+        self._sampler.start()
+        logger.info(f"Profiling enabled for {self.windows} windows (sampling every {self.sample_interval * 1000:.1f} ms).")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a stage and tags the stack samples taken while it runs."""
+        self._stages.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stages.pop()
+            timing = self._timings[name]
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+
+    def end_window(self):
+        """Counts a finished window and writes the output once enough windows were profiled."""
+        self._windows_done += 1
+        if self._windows_done >= self.windows:
+            self.finish()
+
+    def _sample_loop(self):
+        """Samples the target thread's stack until stopped."""
+        while not self._stop_event.wait(self.sample_interval):
+            stages = tuple(self._stages)
+            if not stages:
+                continue
+            frame = sys._current_frames().get(self._target_thread)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self._samples[';'.join(stages + tuple(reversed(frames)))] += 1
+            self._stage_samples[stages[-1]] += 1
+
+    def finish(self):
+        """Stops sampling, writes the collapsed stacks and summary table, and disables profiling."""
+        global _profiler
+        self._stop_event.set()
+        if self._sampler is not None and self._sampler is not threading.current_thread():
+            self._sampler.join()
+        if _profiler is self:
+            _profiler = None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        try:
+            with open(f"{prefix}.collapsed", 'w') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            summary = self.summary()
+            with open(f"{prefix}_summary.txt", 'w') as f:
+                f.write(summary + "\n")
+        except OSError as e:
+            logger.error(f"Failed to write profiling output: {e}")
+            return
+
+        logger.info(f"Profiling finished after {self._windows_done} windows. Output written to {prefix}.collapsed "
+                    f"and {prefix}_summary.txt\n{summary}")
+
+    def summary(self) -> str:
+        """Returns the per-stage summary table as text."""
+        wall = time.perf_counter() - self._started_at
+        lines = [
+            f"Profiled {self._windows_done} windows in {wall:.3f} s (sample interval {self.sample_interval * 1000:.1f} ms)",
+            "Times of nested stages are inclusive; samples are counted for the innermost stage only.",
+            f"{'stage':<24} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'% wall':>7} {'samples':>8}",
+        ]
+        for name, (calls, total, peak) in sorted(self._timings.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{name:<24} {calls:>6} {total:>9.3f} {total / calls * 1000:>9.2f} {peak * 1000:>9.2f} "
+                f"{(total / wall * 100 if wall else 0):>6.1f}% {self._stage_samples[name]:>8}"
+            )
+        return '\n'.join(lines)
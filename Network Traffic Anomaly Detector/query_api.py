@@ -0,0 +1,387 @@
+import bisect
+import glob
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from alerts import SEVERITY_LEVELS
+from config import QUERY_API_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class AnomalyIndex:
+    """
+    In-memory ring of recent anomalies and window summaries, indexed for fast queries.
+
+    Anomalies are kept in insertion (= time) order in a bounded ring. Secondary indexes map
+    each src/dst IP and each severity to the sequence numbers of its records, oldest first,
+    so evicting the oldest record is O(1) per index and "newest first since T" queries
+    stop as soon as they reach records older than T. All methods are thread-safe.
+    """
+
+    def __init__(self, max_records: int = 10000, max_windows: int = 1440):
+        """
+        Parameters:
+        max_records (int): Maximum number of anomaly rows kept in memory.
+        max_windows (int): Maximum number of window summaries kept in memory.
+        """
+        self.max_records = max_records
+        self._lock = threading.Lock()
+
+        # Ring of anomaly records: parallel lists compacted when the head gets too far
+        self._records: List[dict] = []
+        self._times: List[float] = []
+        self._head = 0
+        self._next_seq = 0  # Sequence number of the next record; seq - first_seq = offset in the ring
+        self._first_seq = 0
+
+        self._by_ip: Dict[str, deque] = {}
+        self._by_severity: Dict[str, deque] = {}
+
+        self._windows = deque(maxlen=max_windows)
+
+    def add_anomalies(self, anomalies: pd.DataFrame, severity: str, alert_time: Optional[float] = None):
+        """
+        Adds the rows of an alert to the index.
+
+        Parameters:
+        anomalies (pandas.DataFrame): Anomaly rows as sent to AlertManager.
+        severity (str): Severity of the alert.
+        alert_time (float, optional): Epoch seconds of the alert. Defaults to now.
+        """
+        if anomalies.empty:
+            return
+        alert_time = alert_time if alert_time is not None else time.time()
+        rows = json.loads(anomalies.to_json(orient='records'))
+
+        with self._lock:
+            for row in rows:
+                seq = self._next_seq
+                self._next_seq += 1
+                record = {'seq': seq, 'time': alert_time, 'severity': severity, 'anomaly': row}
+                self._records.append(record)
+                self._times.append(alert_time)
+
+                for ip in {row.get('src_ip'), row.get('dst_ip')}:
+                    if ip:
+                        self._by_ip.setdefault(ip, deque()).append(seq)
+                self._by_severity.setdefault(severity, deque()).append(seq)
+
+            while len(self._records) - self._head > self.max_records:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        """Drops the oldest record from the ring and its index entries (lock must be held)."""
+        record = self._records[self._head]
+        self._head += 1
+        self._first_seq += 1
+
+        row = record['anomaly']
+        for ip in {row.get('src_ip'), row.get('dst_ip')}:
+            if ip:
+                seqs = self._by_ip[ip]
+                seqs.popleft()
+                if not seqs:
+                    del self._by_ip[ip]
+        seqs = self._by_severity[record['severity']]
+        seqs.popleft()
+        if not seqs:
+            del self._by_severity[record['severity']]
+
+        # Compact the backing lists once the dead prefix is as large as the live part
+        if self._head >= self.max_records:
+            del self._records[:self._head]
+            del self._times[:self._head]
+            self._head = 0
+
+    def add_windows(self, windows: pd.DataFrame):
+        """
+        Adds scored window summaries (as returned by SlidingWindowScorer.update).
+
+        Parameters:
+        windows (pandas.DataFrame): One row per closed window.
+        """
+        if windows.empty:
+            return
+        rows = json.loads(windows.to_json(orient='records'))
+        with self._lock:
+            self._windows.extend(rows)
+
+    def _record(self, seq: int) -> dict:
+        """Returns the record with a given sequence number (lock must be held)."""
+        return self._records[self._head + seq - self._first_seq]
+
+    def query_anomalies(self, host: Optional[str] = None, severity: Optional[str] = None,
+                        since: Optional[float] = None, limit: int = 100) -> List[dict]:
+        """
+        Returns recent anomalies, newest first.
+
+        Parameters:
+        host (str, optional): Only anomalies where the IP is the source or destination.
+        severity (str, optional): Only anomalies of this severity.
+        since (float, optional): Only anomalies alerted at or after this epoch time.
+        limit (int): Maximum number of records returned.
+
+        Returns:
+        list: Records with 'seq', 'time', 'severity' and 'anomaly' (the original row).
+        """
+        if limit <= 0:
+            raise ValueError("limit must be >= 1")
+        results = []
+        with self._lock:
+            if host is not None or severity is not None:
+                # Walk the smallest matching index newest-first and check the other filter
+                candidates = [index.get(key, ()) for index, key in
+                              ((self._by_ip, host), (self._by_severity, severity)) if key is not None]
+                seqs = min(candidates, key=len)
+                for seq in reversed(seqs):
+                    record = self._record(seq)
+                    if since is not None and record['time'] < since:
+                        break
+                    if severity is not None and record['severity'] != severity:
+                        continue
+                    row = record['anomaly']
+                    if host is not None and host not in (row.get('src_ip'), row.get('dst_ip')):
+                        continue
+                    results.append(record)
+                    if len(results) >= limit:
+                        break
+            else:
+                start = self._head
+                if since is not None:
+                    start = bisect.bisect_left(self._times, since, lo=self._head)
+                first = max(start, len(self._records) - limit)
+                results = self._records[first:][::-1]
+        return results
+
+    def severity_counts(self, since: Optional[float] = None) -> List[dict]:
+        """
+        Counts anomalies per severity, most severe first.
+
+        Parameters:
+        since (float, optional): Only count anomalies alerted at or after this epoch time.
+
+        Returns:
+        list: [{'severity': ..., 'count': ...}, ...] for the severities present.
+        """
+        with self._lock:
+            if since is None:
+                counts = Counter({severity: len(seqs) for severity, seqs in self._by_severity.items()})
+            else:
+                start = bisect.bisect_left(self._times, since, lo=self._head)
+                counts = Counter(record['severity'] for record in self._records[start:])
+        ordered = sorted(counts.items(), key=lambda item: -SEVERITY_LEVELS.get(item[0], -1))
+        return [{'severity': severity, 'count': count} for severity, count in ordered]
+
+    def query_windows(self, since: Optional[float] = None, anomalous_only: bool = False,
+                      limit: int = 100) -> List[dict]:
+        """
+        Returns recent window summaries, newest first.
+
+        Parameters:
+        since (float, optional): Only windows ending at or after this epoch time.
+        anomalous_only (bool): Only windows flagged as anomalous.
+        limit (int): Maximum number of windows returned.
+        """
+        if limit <= 0:
+            raise ValueError("limit must be >= 1")
+        results = []
+        with self._lock:
+            for window in reversed(self._windows):
+                if since is not None and window.get('window_end', 0) < since:
+                    break
+                if anomalous_only and not window.get('anomaly'):
+                    continue
+                results.append(window)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def iter_persisted_anomalies(alerts_dir: str) -> Iterator[dict]:
+    """
+    Yields anomaly records from the persisted alert files, newest first.
+
+    Files are read lazily, one at a time, so paging stops reading as soon as the page is full.
+
+    Parameters:
+    alerts_dir (str): Directory with the alert_*.json files written by AlertManager.
+    """
+    # alert_YYYYmmdd_HHMMSS[_ffffff[_n]].json names sort chronologically
+    for filename in sorted(glob.glob(os.path.join(alerts_dir, 'alert_*.json')), reverse=True):
+        try:
+            with open(filename) as f:
+                alert = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable alert file {filename}: {e}")
+            continue
+        try:
+            alert_time = datetime.strptime(alert.get('timestamp', ''), '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            alert_time = None
+        for row in reversed(alert.get('anomalies', [])):
+            yield {'time': alert_time, 'severity': alert.get('severity'), 'anomaly': row,
+                   'file': os.path.basename(filename)}
+
+
+def query_history(alerts_dir: str, host: Optional[str] = None, severity: Optional[str] = None,
+                  page: int = 0, page_size: int = 100) -> dict:
+    """
+    Pages through the persisted alert log, newest first.
+
+    Parameters:
+    alerts_dir (str): Directory with the persisted alert files.
+    host (str, optional): Only anomalies where the IP is the source or destination.
+    severity (str, optional): Only anomalies of this severity.
+    page (int): Zero-based page number.
+    page_size (int): Records per page.
+
+    Returns:
+    dict: {'page': ..., 'page_size': ..., 'results': [...], 'has_more': bool}
+    """
+    if page < 0:
+        raise ValueError("page must be >= 0")
+    if page_size <= 0:
+        raise ValueError("page_size must be >= 1")
+    skip = page * page_size
+    results = []
+    has_more = False
+    for record in iter_persisted_anomalies(alerts_dir):
+        row = record['anomaly']
+        if severity is not None and record['severity'] != severity:
+            continue
+        if host is not None and host not in (row.get('src_ip'), row.get('dst_ip')):
+            continue
+        if skip:
+            skip -= 1
+            continue
+        if len(results) == page_size:
+            has_more = True
+            break
+        results.append(record)
+    return {'page': page, 'page_size': page_size, 'results': results, 'has_more': has_more}
+
+
+def _parse_since(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a 'since' parameter: 'today', a duration ('900', '15m', '2h', '1d') or None.
+
+    Returns:
+    float: Epoch seconds, or None when no time filter was requested.
+    """
+    if not value:
+        return None
+    if value == 'today':
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    multiplier = units.get(value[-1], None)
+    amount = float(value[:-1] if multiplier else value)
+    return time.time() - amount * (multiplier or 1)
+
+
+def _int_param(params: Dict[str, str], name: str, default: int, minimum: int) -> int:
+    """Parses an integer query parameter, raising ValueError if it is not an integer >= minimum."""
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be >= {minimum}")
+    return value
+
+
+def _host_param(params: Dict[str, str]) -> Optional[str]:
+    """
+    Parses the host query parameter into the canonical address form stored in the index
+    (lowercase, compressed IPv6), raising ValueError if it is not an IP address.
+    """
+    host = params.get('host')
+    if host is None:
+        return None
+    try:
+        return str(ipaddress.ip_address(host.strip()))
+    except ValueError:
+        raise ValueError("host must be an IP address")
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """Serves the read-only JSON endpoints of the query API."""
+
+    index: AnomalyIndex = None
+    alerts_dir: str = os.path.join('logs', 'alerts')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            limit = _int_param(params, 'limit', 100, minimum=1)
+            host = _host_param(params)
+            since = _parse_since(params.get('since'))
+            severity = params.get('severity', '').upper() or None
+            if severity is not None and severity not in SEVERITY_LEVELS:
+                raise ValueError(f"unknown severity {severity}")
+
+            if url.path == '/anomalies':
+                body = self.index.query_anomalies(host, severity, since, limit)
+            elif url.path == '/severities':
+                body = self.index.severity_counts(since)
+            elif url.path == '/windows':
+                body = self.index.query_windows(since, params.get('anomalous') in ('1', 'true'), limit)
+            elif url.path == '/history':
+                body = query_history(self.alerts_dir, host, severity,
+                                     _int_param(params, 'page', 0, minimum=0),
+                                     _int_param(params, 'page_size', limit, minimum=1))
+            else:
+                self._send(404, {'error': f"unknown endpoint {url.path}",
+                                 'endpoints': ['/anomalies', '/severities', '/windows', '/history']})
+                return
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, body)
+
+    def _send(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Route access logs through logging instead of stderr
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def start_query_api(index: AnomalyIndex, config: Optional[dict] = None,
+                    alerts_dir: str = os.path.join('logs', 'alerts')) -> ThreadingHTTPServer:
+    """
+    Starts the query API in a daemon thread.
+
+    Parameters:
+    index (AnomalyIndex): Index answering the in-memory queries.
+    config (dict, optional): API settings. Defaults to QUERY_API_CONFIG from config.
+    alerts_dir (str): Directory of persisted alerts used by /history.
+
+    Returns:
+    http.server.ThreadingHTTPServer: The running server (call shutdown() to stop it).
+    """
+    config = config if config else QUERY_API_CONFIG
+    handler = type('QueryHandler', (_QueryHandler,), {'index': index, 'alerts_dir': alerts_dir})
+    server = ThreadingHTTPServer((config.get('host', '127.0.0.1'), config.get('port', 8765)), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='query-api', daemon=True)
+    thread.start()
+    logger.info(f"Query API listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    return server
@@ -0,0 +1,229 @@
+import logging
+import math
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import WINDOW_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Additive per-bucket counters kept in the ring buffer (order defines the vector layout)
+COUNTER_FEATURES = ['packets', 'bytes', 'tcp', 'udp', 'icmp', 'other', 'syn', 'rst', 'fin']
+
+# Features of a window-level vector (counters plus derived values)
+WINDOW_FEATURES = COUNTER_FEATURES + ['unique_src_ips', 'unique_dst_ips', 'syn_ratio', 'rst_ratio']
+
+# TCP flag bits used for the flag ratios
+_SYN, _RST, _FIN = 0x02, 0x04, 0x01
+
+
+class _Bucket:
+    """Aggregates of the packets that fall in one time bucket."""
+
+    __slots__ = ('index', 'counters', 'src_ips', 'dst_ips')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.counters = np.zeros(len(COUNTER_FEATURES), dtype=np.float64)
+        self.src_ips = Counter()
+        self.dst_ips = Counter()
+
+
+def _bucket_aggregates(rows: pd.DataFrame):
+    """
+    Computes the additive counters and per-IP counts for a group of rows in one pass.
+
+    Returns:
+    tuple: (counters array, src IP Counter, dst IP Counter)
+    """
+    protocol = rows['protocol'].astype(str) if 'protocol' in rows.columns else pd.Series('', index=rows.index)
+    if 'tcp_flags' in rows.columns:
+        flags = pd.to_numeric(rows['tcp_flags'], errors='coerce').fillna(0).astype(np.int64)
+    else:
+        flags = pd.Series(0, index=rows.index)
+    lengths = pd.to_numeric(rows['length'], errors='coerce').fillna(0) if 'length' in rows.columns else 0
+
+    is_tcp = protocol == 'TCP'
+    is_udp = protocol == 'UDP'
+    is_icmp = protocol.isin(['ICMP', 'ICMPv6'])
+    counters = np.array([
+        len(rows),
+        float(np.sum(lengths)),
+        is_tcp.sum(),
+        is_udp.sum(),
+        is_icmp.sum(),
+        len(rows) - is_tcp.sum() - is_udp.sum() - is_icmp.sum(),
+        (is_tcp & ((flags & _SYN) != 0)).sum(),
+        (is_tcp & ((flags & _RST) != 0)).sum(),
+        (is_tcp & ((flags & _FIN) != 0)).sum(),
+    ], dtype=np.float64)
+
+    src_ips = Counter(rows['src_ip'].dropna().value_counts().to_dict()) if 'src_ip' in rows.columns else Counter()
+    dst_ips = Counter(rows['dst_ip'].dropna().value_counts().to_dict()) if 'dst_ip' in rows.columns else Counter()
+    return counters, src_ips, dst_ips
+
+
+class SlidingWindowScorer:
+    """
+    Scores sliding windows of traffic built from fixed-duration time buckets.
+
+    The window is a ring buffer of `window_buckets` buckets. Window-level aggregates
+    (counters and per-IP reference counts) are updated incrementally: packets entering
+    a bucket are added and an evicted bucket is subtracted, so the cost of a step depends
+    only on the size of the buckets involved, never on the window length. Each time a
+    bucket closes, the window vector is scored against an exponentially weighted
+    baseline (mean/variance per feature) and flagged when its z-score exceeds the threshold.
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        """
+        Parameters:
+        config (dict, optional): Window settings. Defaults to WINDOW_CONFIG from config.
+        """
+        self.config = config if config else WINDOW_CONFIG
+        self.bucket_seconds = float(self.config.get('bucket_seconds', 10))
+        self.window_buckets = int(self.config.get('window_buckets', 6))
+        self.z_threshold = float(self.config.get('z_threshold', 4.0))
+        self.warmup_windows = int(self.config.get('warmup_windows', 10))
+        self.alpha = float(self.config.get('ewma_alpha', 0.1))
+
+        self._ring: List[Optional[_Bucket]] = [None] * self.window_buckets
+        self._current: Optional[int] = None  # Index of the newest (still open) bucket
+
+        # Incrementally maintained window aggregates
+        self._counters = np.zeros(len(COUNTER_FEATURES), dtype=np.float64)
+        self._src_ips = Counter()
+        self._dst_ips = Counter()
+
+        # Exponentially weighted baseline of window vectors
+        self._mean = np.zeros(len(WINDOW_FEATURES), dtype=np.float64)
+        self._var = np.zeros(len(WINDOW_FEATURES), dtype=np.float64)
+        self._scored = 0
+
+    def window_vector(self) -> np.ndarray:
+        """Returns the current window-level feature vector (see WINDOW_FEATURES)."""
+        tcp = self._counters[COUNTER_FEATURES.index('tcp')]
+        syn = self._counters[COUNTER_FEATURES.index('syn')]
+        rst = self._counters[COUNTER_FEATURES.index('rst')]
+        derived = np.array([
+            len(self._src_ips),
+            len(self._dst_ips),
+            syn / tcp if tcp else 0.0,
+            rst / tcp if tcp else 0.0,
+        ], dtype=np.float64)
+        return np.concatenate([self._counters, derived])
+
+    def update(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Feeds a batch of preprocessed rows into the window and scores every window that closes.
+
+        Parameters:
+        data (pandas.DataFrame): Rows produced by preprocess_packets (must contain 'timestamp').
+
+        Returns:
+        pandas.DataFrame: One row per closed window with its features, 'window_start',
+                          'window_end', 'score' and 'anomaly'. Empty if no bucket closed.
+        """
+        results = []
+        if data.empty or 'timestamp' not in data.columns:
+            return self._results_frame(results)
+
+        timestamps = pd.to_numeric(data['timestamp'], errors='coerce')
+        bucket_ids = np.floor(timestamps / self.bucket_seconds)
+        valid = bucket_ids.notna()
+        for bucket_index, rows in data[valid].groupby(bucket_ids[valid].astype(np.int64), sort=True):
+            bucket_index = int(bucket_index)
+            if self._current is None:
+                self._current = bucket_index
+            elif bucket_index > self._current:
+                results.extend(self._advance(bucket_index))
+            elif bucket_index <= self._current - self.window_buckets:
+                logger.debug(f"Dropping {len(rows)} late packets outside the sliding window.")
+                continue
+            self._add(bucket_index, rows)
+
+        return self._results_frame(results)
+
+    def _slot(self, bucket_index: int) -> _Bucket:
+        """Returns the ring slot for a bucket, reusing it if it holds an expired bucket."""
+        position = bucket_index % self.window_buckets
+        bucket = self._ring[position]
+        if bucket is None or bucket.index != bucket_index:
+            if bucket is not None:
+                self._evict(bucket)
+            bucket = _Bucket(bucket_index)
+            self._ring[position] = bucket
+        return bucket
+
+    def _add(self, bucket_index: int, rows: pd.DataFrame):
+        """Adds rows to a bucket and to the window aggregates."""
+        counters, src_ips, dst_ips = _bucket_aggregates(rows)
+        bucket = self._slot(bucket_index)
+        bucket.counters += counters
+        bucket.src_ips.update(src_ips)
+        bucket.dst_ips.update(dst_ips)
+        self._counters += counters
+        self._src_ips.update(src_ips)
+        self._dst_ips.update(dst_ips)
+
+    def _evict(self, bucket: _Bucket):
+        """Subtracts an expired bucket from the window aggregates."""
+        self._counters -= bucket.counters
+        # Only the IPs seen in the evicted bucket are touched; drop those no longer referenced
+        for ips, removed in ((self._src_ips, bucket.src_ips), (self._dst_ips, bucket.dst_ips)):
+            ips.subtract(removed)
+            for ip in removed:
+                if ips[ip] <= 0:
+                    del ips[ip]
+
+    def _advance(self, bucket_index: int) -> List[dict]:
+        """Closes buckets up to bucket_index (exclusive), scoring the window after each one."""
+        results = []
+        gap = bucket_index - self._current
+        if gap > self.window_buckets:
+            # The whole window expires; only score the window that was actually observed
+            results.append(self._score_current())
+            for position, bucket in enumerate(self._ring):
+                if bucket is not None:
+                    self._evict(bucket)
+                    self._ring[position] = None
+            self._current = bucket_index
+            return results
+
+        for _ in range(gap):
+            results.append(self._score_current())
+            self._current += 1
+            self._slot(self._current)  # Evicts the bucket leaving the window
+        return results
+
+    def _score_current(self) -> dict:
+        """Scores the window ending at the current bucket and updates the baseline."""
+        vector = self.window_vector()
+        if self._scored == 0:
+            self._mean = vector.copy()
+            score = 0.0
+        else:
+            std = np.sqrt(self._var)
+            # Features with no variance yet are compared against their mean's magnitude
+            scale = np.where(std > 0, std, np.maximum(np.abs(self._mean), 1.0))
+            score = float(np.max(np.abs(vector - self._mean) / scale))
+            delta = vector - self._mean
+            self._mean += self.alpha * delta
+            self._var = (1 - self.alpha) * (self._var + self.alpha * delta ** 2)
+        self._scored += 1
+
+        result = dict(zip(WINDOW_FEATURES, vector.tolist()))
+        result['window_start'] = (self._current - self.window_buckets + 1) * self.bucket_seconds
+        result['window_end'] = (self._current + 1) * self.bucket_seconds
+        result['score'] = score if math.isfinite(score) else 0.0
+        result['anomaly'] = self._scored > self.warmup_windows and result['score'] > self.z_threshold
+        return result
+
+    @staticmethod
+    def _results_frame(results: List[dict]) -> pd.DataFrame:
+        """Builds the DataFrame returned by update()."""
+        columns = WINDOW_FEATURES + ['window_start', 'window_end', 'score', 'anomaly']
+        return pd.DataFrame(results, columns=columns)